@@ -1,25 +1,48 @@
 import os
-import json
+import csv
+import mmap
+import datetime
+import orjson
 import psycopg2
 import psycopg2.extras as extras
 from psycopg2 import pool
 from io import StringIO
 from typing import Dict, Any, List, Optional
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from dotenv import load_dotenv
+from openpyxl.reader.excel import ExcelReader
+from python_calamine import CalamineWorkbook
+from openpyxl.xml.constants import SHEET_MAIN_NS
+from openpyxl.xml.functions import iterparse
 import time
 
 load_dotenv()
 
+ROW_TAG = f"{{{SHEET_MAIN_NS}}}row"
+
 # Connection pool (global)
 connection_pool = None
 
+# DSNs whose schema has already been created in this process
+_schema_created = set()
+
+# Extracting a table cell costs ~3 us in-process, while a spawned worker pool
+# costs 0.5-2 s to start (each child re-imports the caller's modules), so only
+# fan sheets out to processes once the table area is this large
+PARALLEL_EXTRACT_MIN_CELLS = 1_000_000
+
+# Drop the JSONB GIN index for a load only when the new rows are at least this
+# fraction of table_data; rebuilding covers every earlier file's rows too
+GIN_DROP_MIN_FRACTION = 0.25
+
 def init_connection_pool():
     """Initialize PostgreSQL connection pool for efficient connections."""
     global connection_pool
     if connection_pool is None:
         connection_pool = pool.ThreadedConnectionPool(
             minconn=2,
-            maxconn=10,
+            maxconn=20,
             host=os.getenv("PGHOST", "localhost"),
             port=int(os.getenv("PGPORT", "5432")),
             database=os.getenv("PGDATABASE", "excel_data_modified"),
@@ -59,37 +82,37 @@ def create_schema(conn):
         cursor.execute("""
         -- Table metadata
         CREATE TABLE IF NOT EXISTS table_metadata (
-            id SERIAL PRIMARY KEY,
-            file_name VARCHAR(500),
-            sheet_name VARCHAR(255),
-            table_name VARCHAR(255),
-            table_type VARCHAR(50),
-            range VARCHAR(100),
+            id BIGINT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+            file_name TEXT NOT NULL,
+            sheet_name TEXT NOT NULL,
+            table_name TEXT,
+            table_type TEXT,
+            range TEXT,
             row_count INTEGER DEFAULT 0,
             headers JSONB,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            created_at TIMESTAMPTZ NOT NULL DEFAULT now()
         );
 
         -- Table data (actual Excel values)
         CREATE TABLE IF NOT EXISTS table_data (
-            id SERIAL PRIMARY KEY,
-            metadata_id INTEGER REFERENCES table_metadata(id) ON DELETE CASCADE,
+            id BIGINT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+            metadata_id BIGINT NOT NULL REFERENCES table_metadata(id) ON DELETE CASCADE,
             row_number INTEGER,
             data JSONB,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            created_at TIMESTAMPTZ NOT NULL DEFAULT now()
         );
 
         -- Formulas
         CREATE TABLE IF NOT EXISTS excel_formulas (
-            id SERIAL PRIMARY KEY,
-            file_name VARCHAR(500),
-            sheet_name VARCHAR(255),
-            cell_address VARCHAR(50),
+            id BIGINT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+            file_name TEXT NOT NULL,
+            sheet_name TEXT NOT NULL,
+            cell_address TEXT NOT NULL,
             formula TEXT,
             readable_formula TEXT,
             dependencies JSONB,
             context JSONB,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            created_at TIMESTAMPTZ NOT NULL DEFAULT now()
         );
         """)
         conn.commit()
@@ -100,15 +123,108 @@ def create_schema(conn):
     finally:
         cursor.close()
 
+def migrate_schema(conn):
+    """
+    Migrate tables created by older versions (SERIAL ids, VARCHAR(n) columns,
+    TIMESTAMP without time zone) to the current column types.
+
+    Rewrites every table, so it only runs when PG_MIGRATE_SCHEMA=1. The existing
+    serial sequences are widened to BIGINT rather than converted to identity columns.
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+        ALTER TABLE table_metadata
+            ALTER COLUMN id TYPE BIGINT,
+            ALTER COLUMN file_name TYPE TEXT,
+            ALTER COLUMN file_name SET NOT NULL,
+            ALTER COLUMN sheet_name TYPE TEXT,
+            ALTER COLUMN sheet_name SET NOT NULL,
+            ALTER COLUMN table_name TYPE TEXT,
+            ALTER COLUMN table_type TYPE TEXT,
+            ALTER COLUMN range TYPE TEXT,
+            ALTER COLUMN created_at TYPE TIMESTAMPTZ,
+            ALTER COLUMN created_at SET DEFAULT now(),
+            ALTER COLUMN created_at SET NOT NULL;
+
+        ALTER TABLE table_data
+            ALTER COLUMN id TYPE BIGINT,
+            ALTER COLUMN metadata_id TYPE BIGINT,
+            ALTER COLUMN metadata_id SET NOT NULL,
+            ALTER COLUMN created_at TYPE TIMESTAMPTZ,
+            ALTER COLUMN created_at SET DEFAULT now(),
+            ALTER COLUMN created_at SET NOT NULL;
+
+        ALTER TABLE excel_formulas
+            ALTER COLUMN id TYPE BIGINT,
+            ALTER COLUMN file_name TYPE TEXT,
+            ALTER COLUMN file_name SET NOT NULL,
+            ALTER COLUMN sheet_name TYPE TEXT,
+            ALTER COLUMN sheet_name SET NOT NULL,
+            ALTER COLUMN cell_address TYPE TEXT,
+            ALTER COLUMN cell_address SET NOT NULL,
+            ALTER COLUMN created_at TYPE TIMESTAMPTZ,
+            ALTER COLUMN created_at SET DEFAULT now(),
+            ALTER COLUMN created_at SET NOT NULL;
+
+        ALTER SEQUENCE IF EXISTS table_metadata_id_seq AS BIGINT;
+        ALTER SEQUENCE IF EXISTS table_data_id_seq AS BIGINT;
+        ALTER SEQUENCE IF EXISTS excel_formulas_id_seq AS BIGINT;
+        """)
+        conn.commit()
+        print("[INFO] Schema migrated to BIGINT/TEXT/TIMESTAMPTZ columns")
+    except Exception as error:
+        conn.rollback()
+        print(f"[ERROR] Schema migration failed: {error}")
+        raise
+    finally:
+        cursor.close()
+
+def ensure_schema(conn):
+    """Create (and optionally migrate) the schema at most once per process for each database."""
+    if conn.dsn not in _schema_created:
+        create_schema(conn)
+        if os.getenv("PG_MIGRATE_SCHEMA") == "1":
+            migrate_schema(conn)
+        _schema_created.add(conn.dsn)
+
+def drop_bulk_load_indexes(cursor, new_rows: int) -> bool:
+    """
+    Drop the JSONB path_ops GIN index before a large bulk load into table_data.
+
+    Runs inside the caller's load transaction, so a failed load rolls the drop
+    back with it. create_indexes rebuilds the index over the whole table, so
+    the drop only pays off when the batch is large relative to existing rows.
+
+    Args:
+        cursor: Cursor of the open load transaction
+        new_rows: Number of table_data rows about to be copied
+
+    Returns:
+        bool: True if the index was dropped
+    """
+    cursor.execute("SELECT GREATEST(reltuples, 0) FROM pg_class WHERE oid = 'table_data'::regclass")
+    existing_rows = cursor.fetchone()[0]
+    if new_rows < GIN_DROP_MIN_FRACTION * existing_rows:
+        return False
+    cursor.execute("DROP INDEX IF EXISTS idx_data_pathops")
+    return True
+
 def create_indexes(conn):
     """Create indexes after bulk data load for performance."""
     cursor = conn.cursor()
     try:
         cursor.execute("""
+        SET LOCAL maintenance_work_mem = '1GB';
+        -- Superseded by idx_data_pathops; drop it on existing databases so COPY
+        -- into table_data maintains a single GIN index
+        DROP INDEX IF EXISTS idx_data_gin;
         CREATE INDEX IF NOT EXISTS idx_file_sheet ON table_metadata(file_name, sheet_name);
         CREATE INDEX IF NOT EXISTS idx_table_name ON table_metadata(table_name);
         CREATE INDEX IF NOT EXISTS idx_metadata_id ON table_data(metadata_id);
-        CREATE INDEX IF NOT EXISTS idx_data_gin ON table_data USING GIN(data);
+        -- jsonb_path_ops: smaller index and faster @> containment probes than jsonb_ops
+        CREATE INDEX IF NOT EXISTS idx_data_pathops ON table_data USING GIN(data jsonb_path_ops)
+            WITH (fastupdate = on, gin_pending_list_limit = 16384);
         CREATE INDEX IF NOT EXISTS idx_formula_file ON excel_formulas(file_name, sheet_name);
         CREATE INDEX IF NOT EXISTS idx_cell_address ON excel_formulas(cell_address);
         """)
@@ -131,8 +247,9 @@ def load_json_file(json_path: str) -> dict:
         dict: Parsed JSON data
     """
     try:
-        with open(json_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        with open(json_path, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+                data = orjson.loads(view)
         print(f"[INFO] Loaded JSON file: {json_path}")
         return data
     except Exception as e:
@@ -152,165 +269,279 @@ def extract_and_store_tables_from_json(conn, tables_json_path: str, file_name: s
     Returns:
         dict: Mapping of (sheet_name, table_name) -> table_info for formula processing
     """
-    import openpyxl
-
     # Load tables JSON
     tables_data = load_json_file(tables_json_path)
 
     cursor = conn.cursor()
     table_info_map = {}
+    meta_rows = []
+    data_rows_by_table = {}
 
-    # Load Excel workbook if provided (for extracting actual data)
-    wb = None
-    if excel_file and os.path.exists(excel_file):
-        wb = openpyxl.load_workbook(excel_file, data_only=True)
-        print(f"[INFO] Loaded Excel file for data extraction: {excel_file}")
-
-    # Process each sheet
+    # Explicit tables carry "headers", implicit tables carry "header"
+    sheet_tables = {}
     for sheet_name, sheet_data in tables_data.items():
-        print(f"[INFO] Processing sheet: {sheet_name}")
-
-        ws = None
-        if wb:
-            ws = wb[sheet_name]
-
-        # Process explicit tables
+        tables = []
         for table in sheet_data.get("explicit_tables", []):
-            table_name = table.get("table_name") or table.get("name")
-            headers = table.get("headers", [])
-            r1, c1, r2, c2 = table["r1"], table["c1"], table["r2"], table["c2"]
-            range_str = table.get("range", "")
-
-            # Extract data rows if Excel file is provided
-            data_rows = []
-            if ws:
-                data_rows = extract_data_from_excel(ws, r1, r2, c1, c2, headers)
-
-            # Insert metadata
-            cursor.execute("""
-            INSERT INTO table_metadata
-            (file_name, sheet_name, table_name, table_type, range, row_count, headers)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-            RETURNING id
-            """, (file_name, sheet_name, table_name, 'explicit',
-                  range_str, len(data_rows), json.dumps(headers)))
-
-            metadata_id = cursor.fetchone()[0]
-
-            # Bulk insert data using COPY if data exists
-            if data_rows:
-                insert_table_data_copy_fast(cursor, metadata_id, data_rows)
+            tables.append(('explicit', table.get("table_name") or table.get("name"),
+                           table.get("headers", []), table))
+        for table in sheet_data.get("implicit_tables", []):
+            tables.append(('implicit', table.get("table_name"), table.get("header", []), table))
+        sheet_tables[sheet_name] = tables
 
-            # Store for formula processing
-            table_info_map[(sheet_name, table_name)] = {
-                'r1': r1, 'c1': c1, 'r2': r2, 'c2': c2, 'headers': headers
-            }
+    # Extract data rows per sheet, in worker processes for several large sheets
+    if excel_file and os.path.exists(excel_file):
+        print(f"[INFO] Extracting data from Excel file: {excel_file}")
+        # Sheets without tables need no workbook read at all
+        sheet_names = [name for name, tables in sheet_tables.items() if tables]
+        sheet_regions = [
+            [(t["r1"], t["r2"], t["c1"], t["c2"], headers) for _, _, headers, t in sheet_tables[name]]
+            for name in sheet_names
+        ]
+        total_cells = sum((r2 - r1 + 1) * (c2 - c1 + 1)
+                          for regions in sheet_regions for r1, r2, c1, c2, _ in regions)
+        if len(sheet_names) > 1 and total_cells >= PARALLEL_EXTRACT_MIN_CELLS:
+            workers = min(os.cpu_count() or 1, len(sheet_names))
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(extract_sheet, repeat(excel_file), sheet_names, sheet_regions))
+        else:
+            results = [extract_sheet(excel_file, name, regions)
+                       for name, regions in zip(sheet_names, sheet_regions)]
+        sheet_rows = dict(zip(sheet_names, results))
+    else:
+        sheet_rows = {name: [[] for _ in tables] for name, tables in sheet_tables.items()}
 
-            print(f"  [✓] Explicit table '{table_name}': {len(data_rows)} rows")
+    # Process each sheet
+    for sheet_name, tables in sheet_tables.items():
+        print(f"[INFO] Processing sheet: {sheet_name}")
 
-        # Process implicit tables
-        for table in sheet_data.get("implicit_tables", []):
-            table_name = table.get("table_name")
-            headers = table.get("header", [])
+        for (table_type, table_name, headers, table), data_rows in zip(tables, sheet_rows.get(sheet_name, [])):
             r1, c1, r2, c2 = table["r1"], table["c1"], table["r2"], table["c2"]
             range_str = table.get("range", "")
 
-            # Extract data rows if Excel file is provided
-            data_rows = []
-            if ws:
-                data_rows = extract_data_from_excel(ws, r1, r2, c1, c2, headers)
-
-            # Insert metadata
-            cursor.execute("""
-            INSERT INTO table_metadata
-            (file_name, sheet_name, table_name, table_type, range, row_count, headers)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-            RETURNING id
-            """, (file_name, sheet_name, table_name, 'implicit',
-                  range_str, len(data_rows), json.dumps(headers)))
-
-            metadata_id = cursor.fetchone()[0]
-
-            # Bulk insert data
-            if data_rows:
-                insert_table_data_copy_fast(cursor, metadata_id, data_rows)
+            # Collect metadata for a single batched INSERT
+            meta_rows.append((file_name, sheet_name, table_name, table_type,
+                              range_str, len(data_rows), extras.Json(headers)))
+            data_rows_by_table[(sheet_name, table_name)] = data_rows
 
             # Store for formula processing
             table_info_map[(sheet_name, table_name)] = {
                 'r1': r1, 'c1': c1, 'r2': r2, 'c2': c2, 'headers': headers
             }
 
-            print(f"  [✓] Implicit table '{table_name}': {len(data_rows)} rows")
-
-    if wb:
-        wb.close()
+            print(f"  [✓] {table_type.capitalize()} table '{table_name}': {len(data_rows)} rows")
+
+    # Insert all metadata in one round-trip. RETURNING order is not guaranteed
+    # to follow VALUES order, so match ids back on (sheet_name, table_name).
+    if meta_rows:
+        cursor.execute("SET LOCAL synchronous_commit = off")
+        ids = extras.execute_values(cursor, """
+        INSERT INTO table_metadata
+        (file_name, sheet_name, table_name, table_type, range, row_count, headers)
+        VALUES %s
+        RETURNING id, sheet_name, table_name
+        """, meta_rows, page_size=len(meta_rows), fetch=True)
+
+        # Bulk insert all table data with a single COPY
+        drop_bulk_load_indexes(cursor, sum(len(rows) for rows in data_rows_by_table.values()))
+        insert_table_data_copy_fast(
+            cursor, [(metadata_id, data_rows_by_table[(sheet_name, table_name)])
+                     for metadata_id, sheet_name, table_name in ids]
+        )
 
     conn.commit()
     return table_info_map
 
-def extract_data_from_excel(ws, r1, r2, c1, c2, headers):
+def extract_sheet(excel_file: str, sheet_name: str, regions: list) -> list:
     """
-    Extract actual data from Excel worksheet.
+    Extract data rows for all tables of one sheet.
+
+    Opens its own workbook handles so it can run in a worker process;
+    only the parent process talks to PostgreSQL.
 
     Args:
-        ws: openpyxl worksheet
-        r1, r2, c1, c2: Table boundaries
-        headers: Column headers
+        excel_file: Path to Excel file
+        sheet_name: Worksheet to read
+        regions: List of (r1, r2, c1, c2, headers) table boundaries
 
     Returns:
-        list: List of dictionaries containing row data
+        list: One list of row dictionaries per region, in the same order
     """
-    from openpyxl.utils import get_column_letter
+    with CalamineWorkbook.from_path(excel_file) as wb:
+        sheet = wb.get_sheet_by_name(sheet_name)
+        return extract_data_from_excel(sheet, read_hidden_rows(excel_file, sheet_name), regions)
 
-    def get_merged_cell_value(ws, row, col):
-        """Get value considering merged cells."""
-        for merged_range in ws.merged_cells.ranges:
-            min_col, min_row, max_col, max_row = merged_range.bounds
-            if min_row <= row <= max_row and min_col <= col <= max_col:
-                return ws.cell(row=min_row, column=min_col).value
-        return ws.cell(row=row, column=col).value
+def read_hidden_rows(excel_file: str, sheet_name: str) -> set:
+    """
+    Snapshot a worksheet's hidden rows by scanning its XML once.
 
-    data_rows = []
+    calamine does not expose row visibility. Only the workbook part is parsed
+    to locate the sheet, so shared strings and styles are never loaded, and
+    cell contents are skipped.
 
-    # Start from r1+1 to skip header row
-    for row_idx in range(r1 + 1, r2 + 1):
-        # Skip hidden rows
-        if row_idx in ws.row_dimensions and ws.row_dimensions[row_idx].hidden:
-            continue
+    Args:
+        excel_file: Path to Excel file
+        sheet_name: Worksheet to scan
 
-        row_dict = {}
-        is_empty = True
+    Returns:
+        set: Indices of hidden rows
+    """
+    hidden_rows = set()
+    row_counter = 0
 
-        for col_offset, header in enumerate(headers):
-            col_idx = c1 + col_offset
-            value = get_merged_cell_value(ws, row_idx, col_idx)
+    reader = ExcelReader(excel_file, read_only=True, keep_links=False)
+    try:
+        reader.read_manifest()
+        reader.read_workbook()
+        sheet_path = next(rel.target for sheet, rel in reader.parser.find_sheets()
+                          if sheet.name == sheet_name)
+        with reader.archive.open(sheet_path) as src:
+            for _, element in iterparse(src):
+                if element.tag == ROW_TAG:
+                    row_counter = int(element.get("r", row_counter + 1))
+                    if element.get("hidden") in ("1", "true"):
+                        hidden_rows.add(row_counter)
+                    element.clear()
+    finally:
+        reader.archive.close()
 
-            if value is not None:
-                is_empty = False
-                # Handle datetime objects
-                if hasattr(value, 'isoformat'):
-                    value = value.isoformat()
-                # Convert non-serializable types to string
-                elif not isinstance(value, (str, int, float, bool, type(None))):
-                    value = str(value)
+    return hidden_rows
 
-            row_dict[header] = value
+def extract_data_from_excel(sheet, hidden_rows: set, regions):
+    """
+    Extract actual data from a calamine worksheet for several tables at once.
 
-        if not is_empty:
-            data_rows.append(row_dict)
+    Args:
+        sheet: python_calamine CalamineSheet
+        hidden_rows: Row indices to skip
+        regions: List of (r1, r2, c1, c2, headers) table boundaries
 
-    return data_rows
+    Returns:
+        list: One list of row dictionaries per region, in the same order
+    """
+    tables_rows = [[] for _ in regions]
+    if not regions:
+        return tables_rows
+
+    # Native values as a 2D list anchored at A1
+    rows = sheet.to_python(skip_empty_area=False)
+
+    # Map every covered merged cell to its anchor once (calamine ranges are 0-based)
+    merged_lookup = {}
+    for (min_r, min_c), (max_r, max_c) in sheet.merged_cell_ranges or ():
+        for r in range(min_r + 1, max_r + 2):
+            for c in range(min_c + 1, max_c + 2):
+                merged_lookup[(r, c)] = (min_r + 1, min_c + 1)
+
+    def get_cell_value(row, col):
+        """Get value considering merged cells; calamine reports empty cells as ''."""
+        row, col = merged_lookup.get((row, col), (row, col))
+        if row > len(rows) or col > len(rows[row - 1]):
+            return None
+        value = rows[row - 1][col - 1]
+        if value == "":
+            return None
+        # calamine returns every number as float
+        if isinstance(value, float) and value.is_integer():
+            return int(value)
+        # calamine returns midnight datetimes as plain dates; openpyxl gave
+        # datetimes, so keep the stored YYYY-MM-DDTHH:MM:SS form
+        if isinstance(value, datetime.date) and not isinstance(value, datetime.datetime):
+            return datetime.datetime.combine(value, datetime.time())
+        return value
+
+    for (r1, r2, c1, _, headers), data_rows in zip(regions, tables_rows):
+        # Start from r1+1 to skip header row
+        for row_idx in range(r1 + 1, r2 + 1):
+            # Skip hidden rows
+            if row_idx in hidden_rows:
+                continue
+
+            row_dict = {}
+            is_empty = True
+
+            for col_offset, header in enumerate(headers):
+                value = get_cell_value(row_idx, c1 + col_offset)
+
+                if value is not None:
+                    is_empty = False
+                    # Handle date, datetime and time objects
+                    if hasattr(value, 'isoformat'):
+                        value = value.isoformat()
+                    # Convert non-serializable types (e.g. timedelta) to string
+                    elif not isinstance(value, (str, int, float, bool)):
+                        value = str(value)
+
+                row_dict[header] = value
+
+            if not is_empty:
+                data_rows.append(row_dict)
+
+    return tables_rows
+
+def insert_table_data_copy_fast(cursor, tables: list):
+    """
+    Ultra-fast COPY insertion of every table's rows in one statement.
 
-def insert_table_data_copy_fast(cursor, metadata_id: int, data_rows: list):
-    """Ultra-fast COPY insertion."""
+    Args:
+        cursor: PostgreSQL cursor
+        tables: List of (metadata_id, data_rows) tuples
+    """
     buffer = StringIO()
-    for idx, row_data in enumerate(data_rows, start=1):
-        json_data = json.dumps(row_data).replace('\\', '\\\\').replace('\n', '\\n')
-        buffer.write(f"{metadata_id}|{idx}|{json_data}\n")
+    writer = csv.writer(buffer, quoting=csv.QUOTE_MINIMAL, lineterminator='\n')
+    row_count = 0
+    for metadata_id, data_rows in tables:
+        for idx, row_data in enumerate(data_rows, start=1):
+            writer.writerow((metadata_id, idx, orjson.dumps(row_data).decode()))
+            row_count += 1
+
+    if row_count == 0:
+        return
 
     buffer.seek(0)
-    cursor.copy_from(buffer, 'table_data', sep='|',
-                     columns=('metadata_id', 'row_number', 'data'))
+    cursor.copy_expert(
+        "COPY table_data (metadata_id, row_number, data) FROM STDIN WITH (FORMAT csv)",
+        buffer
+    )
+
+class IterableToFileAdapter:
+    """
+    Minimal file-like wrapper so COPY can read from a generator of text chunks
+    without the whole payload being materialized in memory.
+    """
+
+    def __init__(self, iterable):
+        self.iterator = iter(iterable)
+        self.buffer = ''
+
+    def read(self, size=-1):
+        while size < 0 or len(self.buffer) < size:
+            try:
+                self.buffer += next(self.iterator)
+            except StopIteration:
+                break
+        if size < 0:
+            chunk, self.buffer = self.buffer, ''
+        else:
+            chunk, self.buffer = self.buffer[:size], self.buffer[size:]
+        return chunk
+
+def iter_csv_lines(rows, chunk_size: int = 65536):
+    """
+    Yield rows as CSV text in chunks of roughly chunk_size characters.
+
+    Batching keeps the per-row cost to a single writerow call instead of a
+    getvalue/seek/truncate cycle and adapter concatenation for every line.
+    """
+    chunk = StringIO()
+    writer = csv.writer(chunk, quoting=csv.QUOTE_MINIMAL, lineterminator='\n')
+    for row in rows:
+        writer.writerow(row)
+        if chunk.tell() >= chunk_size:
+            yield chunk.getvalue()
+            chunk.seek(0)
+            chunk.truncate(0)
+    if chunk.tell():
+        yield chunk.getvalue()
 
 def extract_and_store_formulas_from_json(conn, formulas_json_path: str, file_name: str):
     """
@@ -325,46 +556,33 @@ def extract_and_store_formulas_from_json(conn, formulas_json_path: str, file_nam
     formulas_data = load_json_file(formulas_json_path)
 
     cursor = conn.cursor()
-    buffer = StringIO()
-    formula_count = 0
+    formula_count = len(formulas_data)
 
     # Process formulas - the JSON contains a list of formula objects
-    for formula_obj in formulas_data:
-        cell_addr = formula_obj.get("cell", "")
-        formula = formula_obj.get("formula", "")
-        readable_formula = formula_obj.get("readable_formula", "")
-        dependencies = formula_obj.get("dependencies", [])
-        context = formula_obj.get("context", {})
-
-        sheet_name = context.get("sheet", "")
-
-        # Prepare for COPY
-        def escape_csv(val):
-            if val is None:
-                return '\\N'
-            return str(val).replace('\\', '\\\\').replace('\n', '\\n').replace('|', '\\|')
-
-        buffer.write('|'.join([
-            escape_csv(file_name),
-            escape_csv(sheet_name),
-            escape_csv(cell_addr),
-            escape_csv(formula),
-            escape_csv(readable_formula),
-            json.dumps(dependencies),
-            json.dumps(context)
-        ]) + '\n')
-
-        formula_count += 1
-
-    # Bulk insert formulas using COPY
+    def formula_rows():
+        for formula_obj in formulas_data:
+            context = formula_obj.get("context", {})
+            yield (
+                file_name,
+                context.get("sheet", ""),
+                formula_obj.get("cell", ""),
+                formula_obj.get("formula", ""),
+                formula_obj.get("readable_formula", ""),
+                orjson.dumps(formula_obj.get("dependencies", [])).decode(),
+                orjson.dumps(context).decode()
+            )
+
+    # Bulk insert formulas by streaming CSV lines into COPY
     if formula_count > 0:
-        buffer.seek(0)
-        cursor.copy_from(
-            buffer,
-            'excel_formulas',
-            sep='|',
-            columns=('file_name', 'sheet_name', 'cell_address', 'formula',
-                     'readable_formula', 'dependencies', 'context')
+        cursor.execute("SET LOCAL synchronous_commit = off")
+        cursor.copy_expert(
+            """
+            COPY excel_formulas
+            (file_name, sheet_name, cell_address, formula, readable_formula, dependencies, context)
+            FROM STDIN WITH (FORMAT csv,
+                FORCE_NOT_NULL (file_name, sheet_name, cell_address, formula, readable_formula))
+            """,
+            IterableToFileAdapter(iter_csv_lines(formula_rows()))
         )
         print(f"  [✓] Inserted {formula_count} formulas")
 
@@ -385,8 +603,8 @@ def process_json_to_postgres(tables_json_path: str, formulas_json_path: str,
     conn = get_connection()
 
     try:
-        # Create schema
-        create_schema(conn)
+        # Create schema (once per process)
+        ensure_schema(conn)
 
         print(f"\n[INFO] Processing tables from: {tables_json_path}")
         table_info_map = extract_and_store_tables_from_json(
@@ -404,6 +622,12 @@ def process_json_to_postgres(tables_json_path: str, formulas_json_path: str,
     except Exception as error:
         print(f"\n[ERROR] Pipeline failed: {error}")
         conn.rollback()
+        # The table load may have committed with the GIN index dropped before
+        # a later step failed; put it back so queries keep their index
+        try:
+            create_indexes(conn)
+        except Exception:
+            pass
         raise
     finally:
         return_connection(conn)
@@ -1,81 +1,139 @@
-import json
+import hashlib
+import mmap
+import re
+import sys
+import tempfile
+import orjson
 import google.generativeai as genai
+from google.api_core import retry
 from typing import List, Dict, Any
 import os
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+CELL_RE = re.compile(r'^([A-Z]{1,3})(\d+)$')
+
 # Configure Gemini API
 genai.configure(api_key=os.environ.get('GOOGLE_API_KEY'))
 
 
 class ExcelFormulaDocGenerator:
-    def __init__(self, api_key: str = None):
-        """Initialize the documentation generator with Gemini API."""
-        if api_key:
-            genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel('gemini-2.5-flash')
+    def __init__(self, api_key: str = None, cache_dir: str = None, model: genai.GenerativeModel = None):
+        """
+        Initialize the documentation generator with Gemini API.
+
+        Pass an existing `model` to reuse one client across files instead of
+        reconfiguring genai per instance. Responses are cached on disk keyed by
+        model name and prompt, so reruns on unchanged formulas skip the API call.
+        """
+        if model is not None:
+            self.model = model
+        else:
+            if api_key:
+                genai.configure(api_key=api_key)
+            self.model = genai.GenerativeModel('gemini-2.5-flash')
+        self.cache_dir = Path(cache_dir) if cache_dir else Path.home() / '.cache' / 'excel_formula_doc'
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def _cache_path(self, prompt: str) -> Path:
+        """Cache file for a prompt; changes whenever the formulas or model change."""
+        key = hashlib.sha256((self.model.model_name + prompt).encode('utf-8')).hexdigest()
+        return self.cache_dir / f"{key}.txt"
+
+    def _write_cache(self, path: Path, text: str):
+        """Write a cache entry atomically so concurrent runs never read partial files."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
 
     def load_formulas(self, json_file_path: str) -> List[Dict[str, Any]]:
-        """Load formulas from JSON file."""
-        with open(json_file_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        """Load formulas from JSON file (memory-mapped, parsed with orjson)."""
+        with open(json_file_path, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+                return orjson.loads(view)
 
-    def group_formulas_by_pattern(self, formulas: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    def create_unique_formula_summary(self, formulas: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
-        Group formulas by their pattern to identify redundant formulas.
-        Returns dict: {readable_formula: [list of formula objects with that pattern]}
+        Group formulas by their pattern to identify redundant formulas and
+        summarize each unique pattern with its occurrences, in a single pass.
+        Only the first instance of a pattern is kept as its representative.
         """
-        pattern_groups = defaultdict(list)
+        summary = {}
 
         for formula_obj in formulas:
             formula = formula_obj.get('formula', '')
             readable = formula_obj.get('readable_formula', '')
 
-            # Use readable formula as primary pattern, fall back to formula
-            if readable and readable != formula:
-                pattern_key = readable
+            # Use readable formula as primary pattern, fall back to formula.
+            # Copied-down formulas repeat the same pattern many times, so intern it.
+            pattern_key = sys.intern(readable if readable and readable != formula else formula)
+
+            entry = summary.get(pattern_key)
+            if entry is None:
+                entry = summary[pattern_key] = {
+                    'pattern': pattern_key,
+                    'formula_example': formula_obj['formula'],
+                    'readable_formula': formula_obj.get('readable_formula', pattern_key),
+                    'cells': [],
+                    'occurrence_count': 0,
+                    'dependencies': formula_obj.get('dependencies', []),
+                    'context': formula_obj.get('context', {})
+                }
+            entry['cells'].append(formula_obj['cell'])
+            entry['occurrence_count'] += 1
+
+        return list(summary.values())
+
+    def compress_cell_ranges(self, cells: List[str]) -> List[str]:
+        """
+        Coalesce consecutive cells in the same column into ranges.
+        e.g. ['C5', 'C6', 'C7', 'D5'] -> ['C5:C7', 'D5']
+        """
+        rows_by_col = defaultdict(list)
+        others = []
+        for cell in cells:
+            match = CELL_RE.match(cell)
+            if match:
+                rows_by_col[match.group(1)].append(int(match.group(2)))
             else:
-                pattern_key = formula
-
-            pattern_groups[pattern_key].append(formula_obj)
-
-        return dict(pattern_groups)
-
-    def create_unique_formula_summary(self, pattern_groups: Dict[str, List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+                others.append(cell)
+
+        ranges = []
+        for col, rows in rows_by_col.items():
+            rows = sorted(set(rows))
+            start = prev = rows[0]
+            for row in rows[1:] + [None]:
+                if row is not None and row == prev + 1:
+                    prev = row
+                    continue
+                ranges.append(f"{col}{start}" if start == prev else f"{col}{start}:{col}{prev}")
+                if row is not None:
+                    start = prev = row
+        return ranges + others
+
+    def create_prompt_payload(self, unique_formulas: List[Dict[str, Any]]) -> str:
         """
-        Create a summary of unique formulas with their occurrences.
+        Serialize only the fields the prompt uses, compactly, to cut input tokens.
         """
-        unique_formulas = []
-
-        for pattern, instances in pattern_groups.items():
-            # Get representative instance
-            representative = instances[0]
-
-            # Collect all cells where this pattern appears
-            cells = [inst['cell'] for inst in instances]
-
-            unique_formulas.append({
-                'pattern': pattern,
-                'formula_example': representative['formula'],
-                'readable_formula': representative.get('readable_formula', pattern),
-                'cells': cells,
-                'occurrence_count': len(instances),
-                'dependencies': representative.get('dependencies', []),
-                'context': representative.get('context', {})
-            })
-
-        return unique_formulas
+        payload = []
+        for item in unique_formulas:
+            view = {'readable_formula': item['pattern']}
+            if item['formula_example'] != item['pattern']:
+                view['formula_example'] = item['formula_example']
+            view['cells'] = self.compress_cell_ranges(item['cells'])
+            view['occurrence_count'] = item['occurrence_count']
+            payload.append(view)
+        return orjson.dumps(payload).decode()
 
     def group_by_sheet(self, formulas: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
         """Group formulas by sheet name."""
-        sheets = {}
+        sheets = defaultdict(list)
         for formula in formulas:
-            sheet_name = formula.get('context', {}).get('sheet', 'Unknown')
-            if sheet_name not in sheets:
-                sheets[sheet_name] = []
-            sheets[sheet_name].append(formula)
-        return sheets
+            context = formula.get('context') or {}
+            sheets[context.get('sheet', 'Unknown')].append(formula)
+        return dict(sheets)
 
     def create_prompt(self, unique_formulas: List[Dict[str, Any]], sheet_name: str) -> str:
         """Create a detailed prompt for Gemini to document formulas."""
@@ -94,7 +152,7 @@ class ExcelFormulaDocGenerator:
         Excel Function Reference: https://support.microsoft.com/en-us/office/excel-functions-alphabetical-b3944572-255d-4efb-bb96-c6d90033e188
 
         UNIQUE FORMULAS DATA:
-        {json.dumps(unique_formulas, indent=2)}
+        {self.create_prompt_payload(unique_formulas)}
 
         Create comprehensive documentation with EXACTLY these 4 parts:
 
@@ -218,15 +276,23 @@ class ExcelFormulaDocGenerator:
         """Generate documentation for a single sheet with unique formulas."""
 
         # Group by pattern to find unique formulas
-        pattern_groups = self.group_formulas_by_pattern(sheet_formulas)
-        unique_formulas = self.create_unique_formula_summary(pattern_groups)
+        unique_formulas = self.create_unique_formula_summary(sheet_formulas)
 
         print(f"  Found {len(sheet_formulas)} total formulas, {len(unique_formulas)} unique patterns")
 
         prompt = self.create_prompt(unique_formulas, sheet_name)
 
+        cache_path = self._cache_path(prompt)
+        if cache_path.exists():
+            print(f"  Using cached documentation for {sheet_name}")
+            return cache_path.read_text(encoding='utf-8')
+
         try:
-            response = self.model.generate_content(prompt)
+            response = self.model.generate_content(
+                prompt,
+                request_options={"retry": retry.Retry(predicate=retry.if_transient_error)}
+            )
+            self._write_cache(cache_path, response.text)
             return response.text
         except Exception as e:
             return f"Error generating documentation for {sheet_name}: {str(e)}"
@@ -241,35 +307,45 @@ class ExcelFormulaDocGenerator:
         sheets = self.group_by_sheet(formulas)
 
         # Create the main documentation
-        documentation = "=" * 80 + "\n"
-        documentation += "EXCEL FORMULA DOCUMENTATION\n"
-        documentation += "=" * 80 + "\n\n"
-        documentation += f"Generated from: {json_file_path}\n"
-        documentation += f"Total Sheets: {len(sheets)}\n"
-        documentation += f"Total Formulas: {len(formulas)}\n\n"
-        documentation += "=" * 80 + "\n\n"
+        parts = []
+        parts.append("=" * 80 + "\n")
+        parts.append("EXCEL FORMULA DOCUMENTATION\n")
+        parts.append("=" * 80 + "\n\n")
+        parts.append(f"Generated from: {json_file_path}\n")
+        parts.append(f"Total Sheets: {len(sheets)}\n")
+        parts.append(f"Total Formulas: {len(formulas)}\n\n")
+        parts.append("=" * 80 + "\n\n")
 
         # Add table of contents
-        documentation += "TABLE OF CONTENTS\n"
-        documentation += "-" * 80 + "\n\n"
+        parts.append("TABLE OF CONTENTS\n")
+        parts.append("-" * 80 + "\n\n")
         for i, sheet_name in enumerate(sheets.keys(), 1):
-            documentation += f"{i}. {sheet_name}\n"
-        documentation += "\n" + "=" * 80 + "\n\n"
-
-        # Generate documentation for each sheet
-        for sheet_name, sheet_formulas in sheets.items():
-            print(f"\nProcessing sheet: {sheet_name}...")
-            sheet_doc = self.generate_sheet_documentation(sheet_formulas, sheet_name)
-
-            documentation += "\n" + "=" * 80 + "\n"
-            documentation += f"SHEET: {sheet_name}\n"
-            documentation += "=" * 80 + "\n\n"
-            documentation += sheet_doc
-            documentation += "\n\n" + "=" * 80 + "\n\n"
+            parts.append(f"{i}. {sheet_name}\n")
+        parts.append("\n" + "=" * 80 + "\n\n")
 
-        # Write to file
+        # Write to file as each sheet becomes available, so progress is visible
         with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(documentation)
+            f.write("".join(parts))
+
+            # Generate documentation for all sheets concurrently (requests are network-bound)
+            with ThreadPoolExecutor(max_workers=max(1, min(8, len(sheets)))) as executor:
+                futures = {}
+                for sheet_name, sheet_formulas in sheets.items():
+                    print(f"\nProcessing sheet: {sheet_name}...")
+                    futures[sheet_name] = executor.submit(
+                        self.generate_sheet_documentation, sheet_formulas, sheet_name
+                    )
+
+                # Emit in the original sheet order
+                for sheet_name, future in futures.items():
+                    divider = "=" * 80
+                    sheet_part = (f"\n{divider}\nSHEET: {sheet_name}\n{divider}\n\n"
+                                  f"{future.result()}\n\n{divider}\n\n")
+                    f.write(sheet_part)
+                    f.flush()
+                    parts.append(sheet_part)
+
+        documentation = "".join(parts)
 
         print(f"\n✓ Documentation generated successfully: {output_file}")
         return documentation
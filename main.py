@@ -1,9 +1,10 @@
 import os
 from pathlib import Path
 import json
+import xlwings as xw
 
 # Import table extraction, storage, and documentation classes
-from table_extraction import generate_table_report, extract_formulas
+from table_extraction import ensure_xlsx, generate_table_report, extract_formulas
 from data_store import process_json_to_postgres
 from doc_llm_unique import ExcelFormulaDocGenerator
 
@@ -19,15 +20,18 @@ def main():
     tables_json_path = outputs_dir / f"{Path(excel_file).stem}_tables.json"
     formulas_json_path = outputs_dir / f"{Path(excel_file).stem}_formulas.json"
 
-    generate_table_report(excel_file, tables_json_path)
-    extract_formulas(excel_file,table_json_file=tables_json_path,output_json_file=formulas_json_path)
+    with xw.App(visible=False) as app:
+        # Converted copy is only read from; names below keep the original file's
+        xlsx_file = ensure_xlsx(excel_file, app)
+        generate_table_report(xlsx_file, tables_json_path)
+        extract_formulas(xlsx_file,table_json_file=tables_json_path,output_json_file=formulas_json_path, app=app)
 
     # 2. Store both JSONs in PostgreSQL
     process_json_to_postgres(
         str(tables_json_path),
         str(formulas_json_path),
         file_name=Path(excel_file).name,
-        excel_file=str(excel_file)
+        excel_file=str(xlsx_file)
     )
 
     # 3. Generate documentation from formulas JSON
@@ -9,7 +9,7 @@ This module provides functionality to:
 
 Key Features:
 -------------
-- Flood-fill–based implicit table detection using numpy (similar to the 'Number of Islands' logic).
+- Connected-component implicit table detection using numpy/scipy (similar to the 'Number of Islands' logic).
 - Header detection using text/numeric pattern analysis.
 - Formula parsing and dependency mapping using the `formulas` library.
 - Fallback to `xlwings` for formula extraction if `formulas` fails.
@@ -19,24 +19,58 @@ Key Features:
 
 
 import os
+from contextlib import nullcontext
+from functools import lru_cache
 import xlwings as xw
 import formulas
 import json
+import orjson
 import datetime
 import re
 import openpyxl
 import numpy as np
+try:
+    from scipy import ndimage
+except ImportError:  # fall back to the numba / pure-Python flood fill below
+    ndimage = None
 from openpyxl.utils.cell import coordinate_from_string, column_index_from_string
 from openpyxl.utils import range_boundaries, get_column_letter
 
+# Cross-shaped structuring element: cells connect only through edges, not corners
+FOUR_CONNECTIVITY = np.array([[0, 1, 0],
+                              [1, 1, 1],
+                              [0, 1, 0]])
 
-def ensure_xlsx(excel_path):
+# Cell references in a formula, e.g. A1, $B$2, AB10
+_EXTRACT_RE = re.compile(r'\$?[A-Za-z]{1,3}\$?\d+')
+# Same, but only as whole tokens (not inside names like LOG10X or Sheet_A1)
+_REF_RE = re.compile(r'(?<![A-Za-z0-9_])(\$?[A-Za-z]{1,3}\$?\d+)(?![A-Za-z0-9_])')
+# Elementwise "contains a letter" (str.isalpha) over object arrays of strings
+_has_letter = np.frompyfunc(lambda s: any(ch.isalpha() for ch in s), 1, 1)
+
+
+@lru_cache(maxsize=16384)
+def _col_letter(col_idx):
+    """Cached get_column_letter (1 -> 'A')."""
+    return get_column_letter(col_idx)
+
+
+@lru_cache(maxsize=16384)
+def _col_index(col_letter):
+    """Cached column_index_from_string ('A' -> 1)."""
+    return column_index_from_string(col_letter)
+
+
+def ensure_xlsx(excel_path, app=None):
     """
     Ensures the Excel file is in .xlsx format.
     Converts .xls → .xlsx automatically using xlwings.
 
     Args:
         excel_path (str): Path to the Excel file.
+        app (xlwings.App, optional): Running Excel instance to reuse; a new one is
+            started (and closed) only when a conversion is needed and none is given.
+            With a shared app the converted workbook is left open in it.
 
     Returns:
         str: Path to the .xlsx file.
@@ -45,10 +79,15 @@ def ensure_xlsx(excel_path):
     if ext.lower() == ".xls":
         print(f"[INFO] Detected .xls file: {excel_path}")
         converted_path = base + "_converted.xlsx"
-        with xw.App(visible=False) as app:
-            wb = app.books.open(excel_path)
-            wb.save(converted_path)
-            wb.close()
+        if app is None:
+            with xw.App(visible=False) as app:
+                wb = app.books.open(excel_path)
+                wb.save(converted_path)
+                wb.close()
+        else:
+            # Leave the saved book open: app.books.open(converted_path) in
+            # extract_formulas then returns it instead of reading the file again
+            app.books.open(excel_path).save(converted_path)
         print(f"[INFO] Converted .xls to .xlsx: {converted_path}")
         return converted_path
     return excel_path
@@ -73,257 +112,292 @@ def get_explicit_table_regions(ws):
     return regions
 
 
-def build_grid_excluding_explicit(ws, explicit_regions):
+def read_sheet_values(ws):
     """
-    Builds a binary grid marking non-empty cells, excluding explicit Excel tables.
+    Reads all cell values of a worksheet into a 2D object array in one pass.
 
     Args:
         ws (openpyxl.worksheet): The worksheet.
-        explicit_regions (list): List of explicit table regions to exclude.
 
     Returns:
-        np.ndarray: A 2D boolean NumPy array where True marks non-empty cells.
+        np.ndarray: Object array of shape (max_row, max_column); index [r-1, c-1] holds cell (r, c).
     """
-    rows = list(ws.iter_rows(values_only=True))
-    R = len(rows)
+    # max_column rescans every cell on a normal worksheet; read it once
     C = ws.max_column
-    grid = np.zeros((R, C), dtype=bool)
-    explicit_mask = np.zeros_like(grid, dtype=bool)
+    rows = list(ws.iter_rows(values_only=True))
+    values = np.empty((len(rows), C), dtype=object)
+    for i, row in enumerate(rows):
+        values[i, :len(row)] = row[:C]
+    return values
+
+
+def _hidden_cols_mask(ws, C):
+    """
+    Builds a per-column hidden flag array from the sheet's column dimensions.
+
+    Args:
+        ws (openpyxl.worksheet): The worksheet.
+        C (int): Number of columns to cover.
+
+    Returns:
+        np.ndarray: 1D boolean array; index j-1 is True if column j is hidden.
+    """
+    hidden_cols = np.zeros(C, dtype=bool)
+    # Only columns with an explicit dimension entry can be hidden
+    for col_letter, col_dim in ws.column_dimensions.items():
+        if getattr(col_dim, "hidden", False):
+            try:
+                col_idx = _col_index(col_letter)
+            except ValueError:
+                continue
+            if col_idx <= C:
+                hidden_cols[col_idx - 1] = True
+    return hidden_cols
+
+
+def build_grid_excluding_explicit(explicit_regions, values, hidden_cols):
+    """
+    Builds a binary grid marking non-empty cells, excluding explicit Excel tables.
+
+    Args:
+        explicit_regions (list): List of explicit table regions to exclude.
+        values (np.ndarray): Sheet values from read_sheet_values.
+        hidden_cols (np.ndarray): Hidden column mask from _hidden_cols_mask.
+
+    Returns:
+        np.ndarray: A 2D uint8 NumPy array where 1 marks non-empty cells.
+    """
+    R, C = values.shape
+    explicit_mask = np.zeros((R, C), dtype=bool)
     for (r1, c1, r2, c2, _, _) in explicit_regions:
         explicit_mask[r1 - 1:r2, c1 - 1:c2] = True
-    for i, row in enumerate(rows):
+
+    grid = np.not_equal(values, None) & ~explicit_mask & ~hidden_cols[None, :]
+    return grid.view(np.uint8)
+
+
+def _flood_all(grid):
+    """
+    Iterative 4-connected flood fill over a uint8 grid.
+
+    Components are numbered in raster order of their first cell, as with
+    scipy.ndimage.label. Compiled with numba when it is installed.
+
+    Args:
+        grid (np.ndarray): 2D uint8 array where 1 marks non-empty cells.
+
+    Returns:
+        np.ndarray: int32 array of (min_r, max_r, min_c, max_c) per island, 0-based inclusive.
+    """
+    R, C = grid.shape
+    visited = np.zeros((R, C), dtype=np.uint8)
+    stack = np.empty((R * C, 2), dtype=np.int32)
+    # A 4-connected grid has at most ceil(R*C/2) components (checkerboard)
+    out = np.empty(((R * C + 1) // 2, 4), dtype=np.int32)
+    n = 0
+    for i in range(R):
         for j in range(C):
-            col_letter = get_column_letter(j + 1)
-            col_dim = ws.column_dimensions.get(col_letter)
-            if col_dim and getattr(col_dim, "hidden", False):
+            if grid[i, j] == 0 or visited[i, j]:
                 continue
-            val = row[j] if j < len(row) else None
-            if val is not None and not explicit_mask[i, j]:
-                grid[i, j] = True
-    return grid
+            visited[i, j] = 1
+            stack[0, 0] = i
+            stack[0, 1] = j
+            top = 1
+            min_r, max_r, min_c, max_c = i, i, j, j
+            while top > 0:
+                top -= 1
+                r = stack[top, 0]
+                c = stack[top, 1]
+                min_r = min(min_r, r)
+                max_r = max(max_r, r)
+                min_c = min(min_c, c)
+                max_c = max(max_c, c)
+                for dr, dc in ((-1, 0), (1, 0), (0, -1), (0, 1)):
+                    nr = r + dr
+                    nc = c + dc
+                    if 0 <= nr < R and 0 <= nc < C and grid[nr, nc] != 0 and not visited[nr, nc]:
+                        visited[nr, nc] = 1
+                        stack[top, 0] = nr
+                        stack[top, 1] = nc
+                        top += 1
+            out[n, 0] = min_r
+            out[n, 1] = max_r
+            out[n, 2] = min_c
+            out[n, 3] = max_c
+            n += 1
+    return out[:n]
+
+
+# numba costs a noticeable import per process, so only load it when the kernel is used
+if ndimage is None:
+    try:
+        from numba import njit
+        _flood_all = njit(cache=True)(_flood_all)
+    except ImportError:
+        pass
 
 
 def flood_fill_islands(grid, min_rows=2, min_cols=2):
     """
     Identifies contiguous regions of non-empty cells (potential tables).
 
+    Uses scipy's C connected-component labelling (4-connectivity) instead of a
+    Python flood fill, then reads each component's bounding box from find_objects.
+    Without scipy, falls back to _flood_all (numba-compiled when available).
+
     Args:
-        grid (np.ndarray): 2D boolean array representing non-empty cells.
+        grid (np.ndarray): 2D uint8 array where 1 marks non-empty cells.
         min_rows (int, optional): Minimum number of rows for a valid region.
         min_cols (int, optional): Minimum number of columns for a valid region.
 
     Returns:
         list: List of tuples representing table bounding boxes (r1, r2, c1, c2).
     """
-    R, C = grid.shape
-    visited = np.zeros_like(grid, dtype=bool)
     islands = []
-
-    def flood(r, c):
-        stack = [(r, c)]
-        min_r = max_r = r
-        min_c = max_c = c
-        while stack:
-            i, j = stack.pop()
-            if i < 0 or i >= R or j < 0 or j >= C:
-                continue
-            if visited[i, j] or not grid[i, j]:
-                continue
-            visited[i, j] = True
-            min_r = min(min_r, i)
-            max_r = max(max_r, i)
-            min_c = min(min_c, j)
-            max_c = max(max_c, j)
-            stack.extend([(i + 1, j), (i - 1, j), (i, j + 1), (i, j - 1)])
-        return (min_r, max_r, min_c, max_c)
-
-    for i in range(R):
-        for j in range(C):
-            if grid[i, j] and not visited[i, j]:
-                min_r, max_r, min_c, max_c = flood(i, j)
-                height = max_r - min_r + 1
-                width = max_c - min_c + 1
-                if height >= min_rows and width >= min_cols:
-                    islands.append((min_r + 1, max_r + 1, min_c + 1, max_c + 1))
+    if grid.size == 0:
+        return islands
+    if ndimage is None:
+        for min_r, max_r, min_c, max_c in _flood_all(grid).tolist():
+            if max_r - min_r + 1 >= min_rows and max_c - min_c + 1 >= min_cols:
+                islands.append((min_r + 1, max_r + 1, min_c + 1, max_c + 1))
+        return islands
+    labels, _ = ndimage.label(grid.view(bool), structure=FOUR_CONNECTIVITY)
+    for rows, cols in ndimage.find_objects(labels):
+        height = rows.stop - rows.start
+        width = cols.stop - cols.start
+        if height >= min_rows and width >= min_cols:
+            islands.append((int(rows.start) + 1, int(rows.stop), int(cols.start) + 1, int(cols.stop)))
     return islands
 
 
-def split_bbox_on_empty_lines(grid, bbox):
+def _runs(mask):
     """
-    Splits a bounding box into smaller subregions if separated by empty rows or columns.
+    Finds runs of consecutive True values in a 1D boolean array.
 
     Args:
-        grid (np.ndarray): Boolean grid of non-empty cells.
-        bbox (tuple): Bounding box (r1, r2, c1, c2).
+        mask (np.ndarray): 1D boolean array.
 
     Returns:
-        list: List of refined subregions as tuples.
-    """
-    r1, r2, c1, c2 = bbox
-    r0, r1i = r1 - 1, r2 - 1
-    c0, c1i = c1 - 1, c2 - 1
-    subgrid = grid[r0:r1i + 1, c0:c1i + 1]
-    row_sums = subgrid.sum(axis=1)
-    col_sums = subgrid.sum(axis=0)
-
-    empty_row_indices = [i for i, s in enumerate(row_sums) if s == 0]
-    empty_col_indices = [j for j, s in enumerate(col_sums) if s == 0]
-
-    if empty_col_indices:
-        non_empty_cols = []
-        start = None
-        for j in range(subgrid.shape[1]):
-            if col_sums[j] > 0:
-                if start is None:
-                    start = j
-            else:
-                if start is not None:
-                    non_empty_cols.append((start, j - 1))
-                    start = None
-        if start is not None:
-            non_empty_cols.append((start, subgrid.shape[1] - 1))
-        subregions = []
-        for (cs, ce) in non_empty_cols:
-            new_c1 = c0 + cs + 1
-            new_c2 = c0 + ce + 1
-            subbbox = (r1, r2, new_c1, new_c2)
-            subregions.extend(split_bbox_on_empty_rows(grid, subbbox))
-        return subregions
-
-    if empty_row_indices:
-        non_empty_rows = []
-        start = None
-        for i in range(subgrid.shape[0]):
-            if row_sums[i] > 0:
-                if start is None:
-                    start = i
-            else:
-                if start is not None:
-                    non_empty_rows.append((start, i - 1))
-                    start = None
-        if start is not None:
-            non_empty_rows.append((start, subgrid.shape[0] - 1))
-        subregions = []
-        for (rs, re) in non_empty_rows:
-            new_r1 = r0 + rs + 1
-            new_r2 = r0 + re + 1
-            subregions.append((new_r1, new_r2, c1, c2))
-        return subregions
-
-    return [bbox]
+        list: (start, stop) index pairs, stop exclusive.
+    """
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], mask.astype(np.int8), [0]))))
+    return list(zip(edges[0::2].tolist(), edges[1::2].tolist()))
 
 
-def split_bbox_on_empty_rows(grid, bbox):
+def split_bbox(grid, bbox):
     """
-    Helper function that recursively splits bounding boxes by empty rows/columns.
+    Splits a bounding box into smaller subregions separated by empty rows or columns.
+
+    Regions are refined with an explicit work stack, alternating between column and
+    row splits: a region split on columns has its pieces split on rows next, and
+    vice versa. A region whose primary axis has no gaps is split once on the other
+    axis and then emitted.
 
     Args:
-        grid (np.ndarray): Boolean grid of non-empty cells.
+        grid (np.ndarray): uint8 grid of non-empty cells.
         bbox (tuple): Bounding box (r1, r2, c1, c2).
 
     Returns:
-        list: List of split bounding boxes.
-    """
-    r1, r2, c1, c2 = bbox
-    r0, r1i = r1 - 1, r2 - 1
-    c0, c1i = c1 - 1, c2 - 1
-    subgrid = grid[r0:r1i + 1, c0:c1i + 1]
-    row_sums = subgrid.sum(axis=1)
-    col_sums = subgrid.sum(axis=0)
-
-    empty_row_indices = [i for i, s in enumerate(row_sums) if s == 0]
-    empty_col_indices = [j for j, s in enumerate(col_sums) if s == 0]
-
-    if empty_row_indices:
-        non_empty_rows = []
-        start = None
-        for i in range(subgrid.shape[0]):
-            if row_sums[i] > 0:
-                if start is None:
-                    start = i
+        list: List of refined subregions as tuples (r1, r2, c1, c2).
+    """
+    out = []
+    # Stack entries: (bbox, split columns first?)
+    stack = [(bbox, True)]
+    while stack:
+        (r1, r2, c1, c2), cols_first = stack.pop()
+        subgrid = grid[r1 - 1:r2, c1 - 1:c2]
+
+        axes = ("col", "row") if cols_first else ("row", "col")
+        for depth, axis in enumerate(axes):
+            if axis == "col":
+                runs = _runs(np.add.reduce(subgrid, axis=0) > 0)
+                full = subgrid.shape[1]
+                pieces = [(r1, r2, c1 + s, c1 + e - 1) for s, e in runs]
             else:
-                if start is not None:
-                    non_empty_rows.append((start, i - 1))
-                    start = None
-        if start is not None:
-            non_empty_rows.append((start, subgrid.shape[0] - 1))
-        out = []
-        for rs, re in non_empty_rows:
-            new_r1 = r0 + rs + 1
-            new_r2 = r0 + re + 1
-            out.extend(split_bbox_on_empty_lines(grid, (new_r1, new_r2, c1, c2)))
-        return out
-
-    if empty_col_indices:
-        non_empty_cols = []
-        start = None
-        for j in range(subgrid.shape[1]):
-            if col_sums[j] > 0:
-                if start is None:
-                    start = j
+                runs = _runs(np.add.reduce(subgrid, axis=1) > 0)
+                full = subgrid.shape[0]
+                pieces = [(r1 + s, r1 + e - 1, c1, c2) for s, e in runs]
+            if runs == [(0, full)]:
+                continue
+            if depth == 0:
+                # Push in reverse so pieces come off the stack left-to-right / top-to-bottom
+                stack.extend((p, not cols_first) for p in reversed(pieces))
             else:
-                if start is not None:
-                    non_empty_cols.append((start, j - 1))
-                    start = None
-        if start is not None:
-            non_empty_cols.append((start, subgrid.shape[1] - 1))
-        out = []
-        for cs, ce in non_empty_cols:
-            new_c1 = c0 + cs + 1
-            new_c2 = c0 + ce + 1
-            out.append((r1, r2, new_c1, new_c2))
-        return out
+                out.extend(pieces)
+            break
+        else:
+            out.append((r1, r2, c1, c2))
+    return out
+
+
+def _build_merged_index(ws):
+    """
+    Maps every cell covered by a merged range to that range's anchor (top-left) cell.
+
+    Args:
+        ws (openpyxl.worksheet): Worksheet object.
 
-    return [bbox]
+    Returns:
+        dict: {(row, col): (anchor_row, anchor_col)} for all merged cells.
+    """
+    merged_idx = {}
+    for merged_range in ws.merged_cells.ranges:
+        min_col, min_row, max_col, max_row = merged_range.bounds
+        for r in range(min_row, max_row + 1):
+            for c in range(min_col, max_col + 1):
+                merged_idx[(r, c)] = (min_row, min_col)
+    return merged_idx
 
 
-def get_merged_cell_value(ws, row, col):
+def get_merged_cell_value(values, row, col, merged_idx):
     """
     Retrieves the value of a cell, considering merged cells.
 
     Args:
-        ws (openpyxl.worksheet): Worksheet object.
+        values (np.ndarray): Sheet values from read_sheet_values.
         row (int): Row index.
         col (int): Column index.
+        merged_idx (dict): Merged cell index from _build_merged_index.
 
     Returns:
         Any: Value from the cell or its merged range top-left cell.
     """
-    for merged_range in ws.merged_cells.ranges:
-        min_col, min_row, max_col, max_row = merged_range.bounds
-        if min_row <= row <= max_row and min_col <= col <= max_col:
-            return ws.cell(row=min_row, column=min_col).value
-    return ws.cell(row=row, column=col).value
+    row, col = merged_idx.get((row, col), (row, col))
+    if row > values.shape[0] or col > values.shape[1]:
+        return None
+    return values[row - 1, col - 1]
 
 
-def detect_header_and_body(ws, r1, r2, c1, c2):
+def detect_header_and_body(values, r1, r2, c1, c2, merged_idx):
     """
     Attempts to detect the header row and data rows in a detected table region.
 
     Args:
-        ws (openpyxl.worksheet): Worksheet object.
+        values (np.ndarray): Sheet values from read_sheet_values.
         r1, r2, c1, c2 (int): Bounding box coordinates.
+        merged_idx (dict): Merged cell index from _build_merged_index.
 
     Returns:
         tuple: (header_row, body_rows)
     """
-    rows = []
-    for i in range(r1, r2 + 1):
-        row = []
-        for j in range(c1, c2 + 1):
-            v = get_merged_cell_value(ws, i, j)
-            row.append("" if v is None else str(v).strip())
-        rows.append(row)
-
-    def looks_text(s):
-        return any(ch.isalpha() for ch in s)
-
-    for idx in range(len(rows) - 1):
-        text_count = sum(1 for cell in rows[idx] if cell and looks_text(cell))
-        next_row = rows[idx + 1]
-        numericish_next = sum(1 for cell in next_row if cell and not looks_text(cell))
-        if text_count >= (len(rows[idx]) / 2) and numericish_next >= (len(next_row) / 3):
-            return rows[idx], rows[idx + 1:]
+    rows = values[r1 - 1:r2, c1 - 1:c2].tolist()
+    for i, row in enumerate(rows):
+        for j, v in enumerate(row):
+            # Only empty cells can be the covered part of a merged range
+            if v is None and (r1 + i, c1 + j) in merged_idx:
+                v = get_merged_cell_value(values, r1 + i, c1 + j, merged_idx)
+            row[j] = "" if v is None else str(v).strip()
+
+    cells = np.array(rows, dtype=object)
+    nonempty = cells != ""
+    has_letter = _has_letter(cells).astype(bool)
+    width = cells.shape[1]
+    text_counts = has_letter.sum(axis=1)
+    numericish_counts = (nonempty & ~has_letter).sum(axis=1)
+    is_header = (text_counts[:-1] >= width / 2) & (numericish_counts[1:] >= width / 3)
+    if is_header.any():
+        idx = int(is_header.argmax())
+        return rows[idx], rows[idx + 1:]
     return rows[0], rows[1:]
 
 
@@ -337,17 +411,19 @@ def bbox_to_range_str(r1, r2, c1, c2):
     Returns:
         str: Excel range string (e.g., "A1:C10").
     """
-    return f"{get_column_letter(c1)}{r1}:{get_column_letter(c2)}{r2}"
+    return f"{_col_letter(c1)}{r1}:{_col_letter(c2)}{r2}"
 
 
-def sanitize_table_headers_from_tableobj(ws, table_obj, r1, c1, r2, c2):
+def sanitize_table_headers_from_tableobj(values, table_obj, r1, c1, r2, c2, merged_idx, hidden_cols):
     """
     Cleans and retrieves valid headers from an explicit table or its first row.
 
     Args:
-        ws (openpyxl.worksheet.worksheet.Worksheet): Worksheet.
+        values (np.ndarray): Sheet values from read_sheet_values.
         table_obj (openpyxl.worksheet.table.Table): Table object.
         r1, c1, r2, c2 (int): Table boundaries.
+        merged_idx (dict): Merged cell index from _build_merged_index.
+        hidden_cols (np.ndarray): Hidden column mask from _hidden_cols_mask.
 
     Returns:
         list: Cleaned list of header names.
@@ -371,11 +447,9 @@ def sanitize_table_headers_from_tableobj(ws, table_obj, r1, c1, r2, c2):
 
     header_row = []
     for j in range(c1, c2 + 1):
-        col_letter = get_column_letter(j)
-        col_dim = ws.column_dimensions.get(col_letter)
-        if col_dim and getattr(col_dim, "hidden", False):
+        if j <= len(hidden_cols) and hidden_cols[j - 1]:
             continue
-        v = get_merged_cell_value(ws, r1, j)
+        v = get_merged_cell_value(values, r1, j, merged_idx)
         s = "" if v is None else str(v).strip()
         if s == "" or s.startswith("[") or (not any(ch.isalpha() for ch in s)):
             continue
@@ -383,6 +457,27 @@ def sanitize_table_headers_from_tableobj(ws, table_obj, r1, c1, r2, c2):
     return header_row
 
 
+def detect_implicit_tables(grid, values, merged_idx):
+    """
+    Finds implicit tables in a sheet grid and detects their headers.
+
+    Args:
+        grid (np.ndarray): uint8 grid of non-empty cells outside explicit tables.
+        values (np.ndarray): Sheet values from read_sheet_values.
+        merged_idx (dict): Merged cell index from _build_merged_index.
+
+    Returns:
+        list: Tuples (r1, r2, c1, c2, header) in detection order.
+    """
+    tables = []
+    for box in flood_fill_islands(grid):
+        for (r1, r2, c1, c2) in split_bbox(grid, box):
+            header, _ = detect_header_and_body(values, r1, r2, c1, c2, merged_idx)
+            filtered_header = [h for h in header if h and not str(h).startswith("[")]
+            tables.append((r1, r2, c1, c2, filtered_header))
+    return tables
+
+
 def generate_table_report(excel_file, out_json="Detected_Tables_report.json"):
     """
     Detects all explicit and implicit tables across all worksheets in an Excel file.
@@ -400,10 +495,13 @@ def generate_table_report(excel_file, out_json="Detected_Tables_report.json"):
     for ws in wb.worksheets:
         sheet_report = {"explicit_tables": [], "implicit_tables": []}
         table_counter = 1  # sequential names for tables without explicit names
+        values = read_sheet_values(ws)
+        merged_idx = _build_merged_index(ws)
+        hidden_cols = _hidden_cols_mask(ws, values.shape[1])
         explicit = get_explicit_table_regions(ws)
         if explicit:
             for (r1, c1, r2, c2, name, table_obj) in explicit:
-                headers = sanitize_table_headers_from_tableobj(ws, table_obj, r1, c1, r2, c2)
+                headers = sanitize_table_headers_from_tableobj(values, table_obj, r1, c1, r2, c2, merged_idx, hidden_cols)
                 effective_name = name if name else f"Table {table_counter}"
                 sheet_report["explicit_tables"].append({
                     "name": name,
@@ -414,30 +512,20 @@ def generate_table_report(excel_file, out_json="Detected_Tables_report.json"):
                 })
                 table_counter += 1
 
-        grid = build_grid_excluding_explicit(ws, explicit)
-        islands = flood_fill_islands(grid)
-        implicit_boxes = []
-        for box in islands:
-            parts = split_bbox_on_empty_lines(grid, box)
-            for p in parts:
-                implicit_boxes.append(p)
-
-        if implicit_boxes:
-            for (r1, r2, c1, c2) in implicit_boxes:
-                header, _ = detect_header_and_body(ws, r1, r2, c1, c2)
-                filtered_header = [h for h in header if h and not str(h).startswith("[")]
-                sheet_report["implicit_tables"].append({
-                    "table_name": f"Table {table_counter}",
-                    "range": bbox_to_range_str(r1, r2, c1, c2),
-                    "r1": r1, "c1": c1, "r2": r2, "c2": c2,
-                    "header": filtered_header
-                })
-                table_counter += 1
+        grid = build_grid_excluding_explicit(explicit, values, hidden_cols)
+        for (r1, r2, c1, c2, header) in detect_implicit_tables(grid, values, merged_idx):
+            sheet_report["implicit_tables"].append({
+                "table_name": f"Table {table_counter}",
+                "range": bbox_to_range_str(r1, r2, c1, c2),
+                "r1": r1, "c1": c1, "r2": r2, "c2": c2,
+                "header": header
+            })
+            table_counter += 1
 
         report[ws.title] = sheet_report
 
-    with open(out_json, "w", encoding="utf-8") as f:
-        json.dump(report, f, indent=2)
+    with open(out_json, "wb") as f:
+        f.write(orjson.dumps(report, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
     print(f"Table extraction report saved to {out_json}")
     return out_json
 
@@ -455,113 +543,134 @@ def extract_references(formula):
     Returns:
         list: List of cell references (e.g., ['A1', 'B2']).
     """
-    pattern = r'(\$?[A-Za-z]{1,3}\$?\d+)'
-    return re.findall(pattern, formula)
+    return _EXTRACT_RE.findall(formula)
+
+
+def build_table_index(table_info):
+    """
+    Flattens detected table metadata into per-sheet NumPy bound arrays for fast lookup.
+
+    Explicit tables come before implicit ones, matching the original search order.
+
+    Args:
+        table_info (dict): Parsed table metadata JSON.
+
+    Returns:
+        dict: {sheet_name: {"r1", "r2", "c1", "c2": np.ndarray, "headers": list}}.
+    """
+    table_index = {}
+    for sheet_name, tables in table_info.items():
+        entries = [(t, t.get("headers", [])) for t in tables.get("explicit_tables", [])]
+        entries += [(t, t.get("header", [])) for t in tables.get("implicit_tables", [])]
+        table_index[sheet_name] = {
+            key: np.array([t.get(key) for t, _ in entries], dtype=np.int64)
+            for key in ("r1", "r2", "c1", "c2")
+        }
+        table_index[sheet_name]["headers"] = [headers for _, headers in entries]
+    return table_index
 
 
-def find_header_for_cell(sheet_name, cell_ref, table_info):
+def find_header_for_cell(sheet_name, cell_ref, table_index):
     """
     Finds the header corresponding to a cell based on detected tables.
 
     Args:
         sheet_name (str): Sheet name.
         cell_ref (str): Cell reference (e.g., 'B2').
-        table_info (dict): Parsed table metadata JSON.
+        table_index (dict): Per-sheet table bounds from build_table_index.
 
     Returns:
         str or None: Header name if found, otherwise None.
     """
     try:
         col, row = coordinate_from_string(cell_ref.replace('$', ''))
-        col_idx = column_index_from_string(col)
+        col_idx = _col_index(col)
         row_idx = int(row)
     except Exception:
         return None
 
-    tables = table_info.get(sheet_name, {})
-    explicit_tables = tables.get("explicit_tables", [])
-    for t in explicit_tables:
-        r1 = t.get("r1")
-        c1 = t.get("c1")
-        r2 = t.get("r2")
-        c2 = t.get("c2")
-        if r1 <= row_idx <= r2 and c1 <= col_idx <= c2:
-            header_pos = col_idx - c1
-            headers = t.get("headers", [])
-            if 0 <= header_pos < len(headers):
-                return headers[header_pos]
-    implicit_tables = tables.get("implicit_tables", [])
-    for t in implicit_tables:
-        r1 = t.get("r1")
-        c1 = t.get("c1")
-        r2 = t.get("r2")
-        c2 = t.get("c2")
-        if r1 <= row_idx <= r2 and c1 <= col_idx <= c2:
-            header_pos = col_idx - c1
-            headers = t.get("header", [])
-            if 0 <= header_pos < len(headers):
-                return headers[header_pos]
+    idx = table_index.get(sheet_name)
+    if idx is None:
+        return None
+    mask = ((idx["r1"] <= row_idx) & (row_idx <= idx["r2"])
+            & (idx["c1"] <= col_idx) & (col_idx <= idx["c2"]))
+    # Fall through to the next containing table when the header row is too short
+    for i in np.flatnonzero(mask):
+        header_pos = col_idx - int(idx["c1"][i])
+        headers = idx["headers"][i]
+        if 0 <= header_pos < len(headers):
+            return headers[header_pos]
     return None
 
 
-def annotate_formula(formula, sheet_name, table_info):
+def annotate_formula(formula, sheet_name, header_lookup):
     """
     Annotates an Excel formula by replacing cell references with their header names.
 
     Args:
         formula (str): Original Excel formula.
         sheet_name (str): Sheet name.
-        table_info (dict): Table info JSON data.
+        header_lookup (callable): (sheet_name, ref without '$') -> header or None,
+            e.g. a cached wrapper around find_header_for_cell.
 
     Returns:
         str: Annotated formula string.
     """
-    refs = set(extract_references(formula))
-    annotated = formula
-    refs_sorted = sorted(refs, key=len, reverse=True)
-    for ref in refs_sorted:
-        header = find_header_for_cell(sheet_name, ref, table_info)
+    # Resolve each distinct reference once; most formulas repeat a few refs
+    mapping = {}
+    for ref in set(_REF_RE.findall(formula)):
+        header = header_lookup(sheet_name, ref.replace('$', ''))
         if header:
-            annotated = re.sub(r'(?<![A-Za-z0-9_])' + re.escape(ref) + r'(?![A-Za-z0-9_])', f"[{header}]", annotated)
-    return annotated
+            mapping[ref] = header
+    if not mapping:
+        return formula
 
+    def repl(m):
+        header = mapping.get(m.group(1))
+        return f"[{header}]" if header else m.group(0)
 
-def extract_context(sheet, cell):
+    return _REF_RE.sub(repl, formula)
+
+
+def extract_context(sheet_name, address, value):
     """
     Extracts contextual metadata for a given Excel cell.
 
     Args:
-        sheet (xlwings.Sheet): Worksheet object.
-        cell (xlwings.Range): Excel cell.
+        sheet_name (str): Worksheet name.
+        address (str): Cell address without '$' (e.g., 'B2').
+        value (Any): Cell value.
 
     Returns:
         dict: Contextual information (sheet name, address, value).
     """
     return {
-        "sheet": sheet.name,
-        "cell_address": cell.address.replace('$', ''),
-        "value": cell.value if cell.value is not None else "empty"
+        "sheet": sheet_name,
+        "cell_address": address,
+        "value": value if value is not None else "empty"
     }
 
 
-class SafeEncoder(json.JSONEncoder):
+def _json_default(obj):
     """
-    Custom JSON encoder for datetime objects.
+    orjson fallback for date-like values it does not serialize natively
+    (e.g. datetime subclasses returned by Excel bridges).
     """
-    def default(self, obj):
-        if isinstance(obj, (datetime.datetime, datetime.date)):
-            return obj.isoformat()
-        return super().default(obj)
+    if isinstance(obj, (datetime.datetime, datetime.date)):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
 
 
-def extract_formulas(excel_filepath, table_json_file, output_json_file):
+def extract_formulas(excel_filepath, table_json_file, output_json_file, app=None):
     """
     Extracts formulas and their dependencies from an Excel workbook.
 
     Args:
-        excel_filepath (str): Path to Excel workbook.
+        excel_filepath (str): Path to an .xlsx workbook (see ensure_xlsx).
         table_json_file (str): Path to JSON file with detected table metadata.
         output_json_file (str): Path to save formula extraction output.
+        app (xlwings.App, optional): Running Excel instance to reuse instead of
+            starting a new one.
 
     Returns:
         None: Writes output to JSON file.
@@ -571,10 +680,14 @@ def extract_formulas(excel_filepath, table_json_file, output_json_file):
         - Falls back to xlwings if formulas library fails.
         - Each formula is annotated with header context.
     """
-    excel_filepath = ensure_xlsx(excel_filepath)
-
     with open(table_json_file, "r", encoding="utf-8") as f:
         table_info = json.load(f)
+    table_index = build_table_index(table_info)
+
+    # The same cells are referenced by many formulas; resolve each one once per run
+    @lru_cache(maxsize=None)
+    def lookup_header(sheet_name, ref):
+        return find_header_for_cell(sheet_name, ref, table_index)
 
     formula_records = []
 
@@ -586,19 +699,28 @@ def extract_formulas(excel_filepath, table_json_file, output_json_file):
         excel_model = None
         formula_mode = "xlwings"
 
-    with xw.App(visible=False) as app:
+    with (nullcontext(app) if app else xw.App(visible=False)) as app:
         wb = app.books.open(excel_filepath)
         for sheet in wb.sheets:
             sheet_name = sheet.name
-            for cell in sheet.used_range:
-                if cell.formula and isinstance(cell.formula, str) and cell.formula.startswith('='):
-                    formula = cell.formula
-                    context = extract_context(sheet, cell)
-                    readable_formula = annotate_formula(formula, sheet_name, table_info)
+            # Two bulk COM reads per sheet instead of several per cell
+            ur = sheet.used_range
+            formulas_grid = ur.formula
+            if isinstance(formulas_grid, str):
+                formulas_grid = ((formulas_grid,),)
+            values_grid = ur.options(ndim=2).value
+            r0, c0 = ur.row, ur.column
+            for i, formula_row in enumerate(formulas_grid):
+                for j, formula in enumerate(formula_row):
+                    if not (formula and isinstance(formula, str) and formula.startswith('=')):
+                        continue
+                    address = f"{_col_letter(c0 + j)}{r0 + i}"
+                    context = extract_context(sheet_name, address, values_grid[i][j])
+                    readable_formula = annotate_formula(formula, sheet_name, lookup_header)
 
                     dependencies = []
                     if excel_model:
-                        addr = f"'[{wb.name}]{sheet_name.upper()}'!{cell.address.replace('$', '')}"
+                        addr = f"'[{wb.name}]{sheet_name.upper()}'!{address}"
                         cell_obj = excel_model.cells.get(addr)
                         if cell_obj and getattr(cell_obj, "inputs", None):
                             deps = list(cell_obj.inputs.keys())
@@ -613,7 +735,7 @@ def extract_formulas(excel_filepath, table_json_file, output_json_file):
                         dependencies = list(dict.fromkeys(extract_references(formula)))
 
                     formula_records.append({
-                        "cell": cell.address.replace('$', ''),
+                        "cell": address,
                         "formula": formula,
                         "readable_formula": readable_formula,
                         "dependencies": dependencies,
@@ -621,8 +743,9 @@ def extract_formulas(excel_filepath, table_json_file, output_json_file):
                     })
         wb.close()
 
-    with open(output_json_file, "w", encoding="utf-8") as f:
-        json.dump(formula_records, f, indent=2, cls=SafeEncoder)
+    with open(output_json_file, "wb") as f:
+        f.write(orjson.dumps(formula_records, default=_json_default,
+                             option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
     print(f"Extracted formulas with header context saved to {output_json_file}")
 
 import os
@@ -639,7 +762,8 @@ def run_analysis(excel_filepath,
     table_json_path = f"outputs/{name_only}_tables.json"
     formula_output_path = f"outputs/{name_only}_formulas.json"
 
-    # ✅ Continue with the workflow
-    excel_filepath = ensure_xlsx(excel_filepath)
-    generate_table_report(excel_filepath, table_json_path)
-    extract_formulas(excel_filepath, table_json_path, formula_output_path)
+    # ✅ Continue with the workflow, sharing one Excel instance throughout
+    with xw.App(visible=False) as app:
+        excel_filepath = ensure_xlsx(excel_filepath, app)
+        generate_table_report(excel_filepath, table_json_path)
+        extract_formulas(excel_filepath, table_json_path, formula_output_path, app)